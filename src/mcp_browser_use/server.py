@@ -2,9 +2,10 @@
 
 import asyncio
 import logging
+import re
 import sys
 import json
-from typing import Dict, Optional, Any, List
+from typing import Dict, Optional, Any, List, TYPE_CHECKING
 from urllib.parse import quote as url_quote
 
 import sys
@@ -36,17 +37,16 @@ def filtered_print(*args, **kwargs):
 # Replace print temporarily during imports to prevent debug pollution
 print = filtered_print
 
-# Optional dependency; we'll fallback gracefully if missing
-try:
-    import markdownify  # type: ignore
-except Exception:  # pragma: no cover
-    markdownify = None  # type: ignore
-
-from browser_use import Browser
 from mcp.server.fastmcp import FastMCP
 
 from .utils import check_playwright_installation
 
+# browser_use (which pulls in Playwright) and markdownify are imported lazily
+# inside the functions that need them, keeping server cold-start fast for
+# clients that only use lightweight tools (wait, send_keys, done, ...).
+if TYPE_CHECKING:
+    from browser_use import Browser
+
 # -----------------------------------------------------------------------------
 # MCP wiring
 # -----------------------------------------------------------------------------
@@ -55,17 +55,31 @@ mcp = FastMCP("browser_use")
 # -----------------------------------------------------------------------------
 # Global state (single-process MCP server, keep this simple)
 # -----------------------------------------------------------------------------
-browser: Optional[Browser] = None
+browser: Optional["Browser"] = None
 current_page: Optional[Any] = None  # browser_use Actor Page
-# index -> unique CSS selector (we re-query each time to avoid stale handles)
-_selector_map: Dict[int, str] = {}
+# index -> {selector, tag, type} captured during inspect_page. Caching tag/type
+# alongside the selector lets action tools skip per-attribute CDP round-trips;
+# we still re-query by selector each time to avoid stale handles.
+_selector_map: Dict[int, Dict[str, str]] = {}
 _last_inspected_url: Optional[str] = None
+# Prewarmed (headless_flag, Browser) instances so re-initialization skips the
+# multi-second Chromium cold start. Restocked in the background on close.
+_pool: "asyncio.Queue" = asyncio.Queue(maxsize=1)
+_prewarm_task: Optional["asyncio.Task"] = None
+# Headless flag of the live session, so the restock on close warms a browser
+# the next initialize can actually use instead of the headless default
+_session_headless: Optional[bool] = None
+# Compiled case-insensitive patterns for validate_page, keyed by needle
+_re_cache: Dict[str, "re.Pattern[str]"] = {}
+# Last-known URL per page (keyed by id(page)); each get_url() is a CDP
+# round-trip, so navigation tools invalidate and everything else reads cached
+_url_cache: Dict[int, str] = {}
 
 
 # -----------------------------------------------------------------------------
 # Helpers
 # -----------------------------------------------------------------------------
-async def _require_browser() -> Browser:
+async def _require_browser() -> "Browser":
     global browser
     if browser is None:
         raise RuntimeError("Browser not initialized. Call initialize_browser first.")
@@ -77,9 +91,128 @@ async def _require_page() -> Any:
     b = await _require_browser()
     if current_page is None:
         current_page = await b.new_page()
+        # id() values get recycled; never inherit a dead page's cached URL
+        _url_cache.pop(id(current_page), None)
+        await _install_page_helpers(current_page)
     return current_page
 
 
+def _browser_configs(headless: bool) -> List[Dict[str, Any]]:
+    """Candidate browser configurations, most robust first."""
+    return [
+        # Configuration 1: Robust settings for MCP environment
+        {
+            "headless": headless,
+            "disable_security": True,
+            "chromium_sandbox": False,
+            "args": [
+                "--no-sandbox",
+                "--disable-dev-shm-usage",
+                "--disable-gpu",
+                "--disable-web-security",
+                "--disable-features=VizDisplayCompositor"
+            ]
+        },
+        # Configuration 2: Basic configuration as fallback
+        {
+            "headless": headless,
+            "args": ["--no-sandbox", "--disable-dev-shm-usage"]
+        },
+        # Configuration 3: Minimal configuration
+        {
+            "headless": headless
+        }
+    ]
+
+
+async def _try_start(config: Dict[str, Any]) -> "Browser":
+    """Launch one browser config with a hard timeout, cleaning up on failure."""
+    from browser_use import Browser
+
+    b = Browser(**config)
+    try:
+        await asyncio.wait_for(b.start(), timeout=30.0)
+    except BaseException:
+        try:
+            await b.stop()
+        except Exception:
+            pass
+        raise
+    return b
+
+
+async def _prewarm(headless: bool = True) -> None:
+    """Launch a browser with the most-likely config and park it in the pool."""
+    try:
+        b = await _try_start(_browser_configs(headless)[0])
+    except Exception as e:
+        logger.debug(f"Browser prewarm failed: {e}")
+        return
+    try:
+        _pool.put_nowait((headless, b))
+        logger.info("Prewarmed browser instance ready")
+    except asyncio.QueueFull:
+        try:
+            await b.stop()
+        except Exception:
+            pass
+
+
+def _kick_prewarm(headless: bool = True) -> None:
+    """Start a background prewarm unless one is running or the pool is full."""
+    global _prewarm_task
+    if _pool.full() or (_prewarm_task is not None and not _prewarm_task.done()):
+        return
+    try:
+        _prewarm_task = asyncio.get_running_loop().create_task(_prewarm(headless))
+    except RuntimeError:  # no running loop (e.g. import time)
+        pass
+
+
+async def _wait_for_ready(page: Any, timeout: float = 10.0) -> None:
+    """
+    Wait until the document reaches DOMContentLoaded instead of sleeping a
+    fixed interval: fast pages resolve immediately, slow pages get the full
+    timeout. Falls back to a short sleep when the page can't be queried
+    (e.g. the frame was torn down mid-navigation).
+    """
+    try:
+        if hasattr(page, "wait_for_load_state"):
+            await asyncio.wait_for(
+                page.wait_for_load_state("domcontentloaded"), timeout=timeout
+            )
+            return
+        js = (
+            "() => new Promise((resolve) => {"
+            " if (document.readyState !== 'loading') return resolve(true);"
+            " addEventListener('DOMContentLoaded', () => resolve(true), {once: true});"
+            " })"
+        )
+        await asyncio.wait_for(page.evaluate(js), timeout=timeout)
+    except Exception:
+        await asyncio.sleep(0.3)
+
+
+async def _settle(page: Any) -> None:
+    """
+    Yield until the renderer has painted twice (double requestAnimationFrame)
+    so an inspect right after a click/navigation sees the settled DOM instead
+    of a half-rendered one. Event-driven, so it costs ~a frame, not a fixed
+    sleep. Chromium throttles rAF indefinitely on backgrounded/occluded tabs,
+    so the promise is raced against a short setTimeout cap to avoid hanging
+    an inspect on an unfocused tab.
+    """
+    try:
+        await page.evaluate(
+            "() => new Promise(r => {"
+            " const cap = setTimeout(r, 250);"
+            " requestAnimationFrame(() => requestAnimationFrame(() => { clearTimeout(cap); r(); }));"
+            " })"
+        )
+    except Exception:
+        pass
+
+
 def _reset_index_if_navigated(new_url: Optional[str]) -> None:
     global _selector_map, _last_inspected_url
     if new_url and _last_inspected_url and new_url != _last_inspected_url:
@@ -87,37 +220,268 @@ def _reset_index_if_navigated(new_url: Optional[str]) -> None:
         _last_inspected_url = new_url
 
 
+async def _page_url(page: Any, *, refresh: bool = False) -> Optional[str]:
+    """
+    Return the page URL from the cache when possible. Tools that navigate
+    invalidate the entry (or overwrite it with a freshly fetched URL), so a
+    cached value is trustworthy for the read-only paths.
+    """
+    key = id(page)
+    if not refresh:
+        cached = _url_cache.get(key)
+        if cached is not None:
+            return cached
+    try:
+        url = await page.get_url()
+    except Exception:
+        return None
+    _url_cache[key] = url
+    return url
+
+
 async def _refresh_current_url() -> Optional[str]:
     try:
         page = await _require_page()
-        return await page.get_url()
+        return await _page_url(page, refresh=True)
     except Exception:
         return None
 
 
+# Inspect helpers, installed once per document on window.__mcp so repeated
+# inspect_page calls only ship a tiny invocation over CDP instead of ~2KB of
+# JS each time. Kept as a plain script body so it works both as an init script
+# (persists across navigations) and inlined into an evaluate fallback.
+_MCP_HELPERS_BODY = r"""
+if (!window.__mcp) {
+  const isVisible = (el) => {
+    const rect = el.getBoundingClientRect();
+    const style = getComputedStyle(el);
+    return rect.width > 0 && rect.height > 0 &&
+           style.visibility !== 'hidden' && style.display !== 'none';
+  };
+
+  // Memos make cssPath O(n) on sibling-heavy DOMs: ancestor paths are shared
+  // between neighbouring elements and nth-of-type counts are computed once
+  // per parent instead of re-walking previousElementSibling per node.
+  // Cleared at the start of each collect() so DOM mutations can't stale them.
+  let pathMemo = new WeakMap();
+  let nthMemo = new WeakMap();
+  // candidate selector -> is it globally unique; avoids repeating the QSA
+  // uniqueness probe for elements sharing the same attribute value
+  let uniqMemo = new Map();
+
+  const cssAttrValue = (v) => v.replace(/\\/g, '\\\\').replace(/"/g, '\\"');
+
+  const uniqueAttrSelector = (el) => {
+    // short, stable selectors beat deep nth-of-type chains: faster to
+    // re-query in later click/input calls and resilient to page updates
+    for (const attr of ['data-testid', 'name', 'aria-label']) {
+      const v = el.getAttribute(attr);
+      if (!v) continue;
+      const candidate = `${el.nodeName.toLowerCase()}[${attr}="${cssAttrValue(v)}"]`;
+      let unique = uniqMemo.get(candidate);
+      if (unique === undefined) {
+        unique = document.querySelectorAll(candidate).length === 1;
+        uniqMemo.set(candidate, unique);
+      }
+      if (unique) return candidate;
+    }
+    return null;
+  };
+
+  const nthOfType = (el) => {
+    const parent = el.parentElement;
+    if (!parent) return 1;
+    let positions = nthMemo.get(parent);
+    if (!positions) {
+      positions = new Map();
+      const counts = new Map();
+      for (const child of parent.children) {
+        const tag = child.nodeName;
+        const n = (counts.get(tag) || 0) + 1;
+        counts.set(tag, n);
+        positions.set(child, n);
+      }
+      nthMemo.set(parent, positions);
+    }
+    return positions.get(el) || 1;
+  };
+
+  const cssPath = (el) => {
+    // generate a fairly unique CSS selector for the element
+    if (!(el instanceof Element)) return '';
+    const memoized = pathMemo.get(el);
+    if (memoized !== undefined) return memoized;
+    const attrSel = uniqueAttrSelector(el);
+    if (attrSel) {
+      pathMemo.set(el, attrSel);
+      return attrSel;
+    }
+    const path = [];
+    let cur = el;
+    while (cur && cur.nodeType === Node.ELEMENT_NODE && path.length < 8) {
+      let selector = cur.nodeName.toLowerCase();
+      if (cur.id) {
+        selector += '#' + CSS.escape(cur.id);
+        path.unshift(selector);
+        break;
+      }
+      selector += `:nth-of-type(${nthOfType(cur)})`;
+      path.unshift(selector);
+      cur = cur.parentElement;
+    }
+    const result = path.join(' > ');
+    pathMemo.set(el, result);
+    return result;
+  };
+
+  // Dirty-tracking between collect() calls: a MutationObserver marks mutated
+  // subtree roots, and a clean page returns the cached element list without
+  // re-walking the DOM at all — the common "inspect → act → inspect" loop on
+  // static pages. Any mutation triggers a full re-walk (subtree splicing is
+  // not worth the complexity at this element count).
+  const dirty = new Set();
+  let lastInspect = null;
+  let observer = null;
+
+  const ensureObserver = () => {
+    if (observer || !document.body) return;
+    observer = new MutationObserver((mutations) => {
+      for (const m of mutations) dirty.add(m.target);
+    });
+    observer.observe(document.body, {
+      childList: true,
+      attributes: true,
+      characterData: true,
+      subtree: true,
+    });
+  };
+
+  const collect = () => {
+    ensureObserver();
+    if (lastInspect && observer && dirty.size === 0) return lastInspect;
+    dirty.clear();
+    pathMemo = new WeakMap();
+    nthMemo = new WeakMap();
+    uniqMemo = new Map();
+    // Single TreeWalker pass with a JS predicate: cheaper on dense DOMs than
+    // the selector engine evaluating and unioning eight comma-selectors, and
+    // no intermediate NodeList to collect
+    const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_ELEMENT, {
+      acceptNode(el) {
+        const n = el.nodeName;
+        if (n === 'A') return el.hasAttribute('href') ? NodeFilter.FILTER_ACCEPT : NodeFilter.FILTER_SKIP;
+        if (n === 'BUTTON' || n === 'TEXTAREA' || n === 'SELECT')
+          return el.disabled ? NodeFilter.FILTER_SKIP : NodeFilter.FILTER_ACCEPT;
+        if (n === 'INPUT')
+          return (el.type !== 'hidden' && !el.disabled) ? NodeFilter.FILTER_ACCEPT : NodeFilter.FILTER_SKIP;
+        if (el.getAttribute('role') === 'button') return NodeFilter.FILTER_ACCEPT;
+        if (el.isContentEditable) return NodeFilter.FILTER_ACCEPT;
+        const ti = el.getAttribute('tabindex');
+        if (ti !== null && ti !== '-1') return NodeFilter.FILTER_ACCEPT;
+        return NodeFilter.FILTER_SKIP;
+      }
+    });
+    const nodes = [];
+    while (walker.nextNode()) nodes.push(walker.currentNode);
+
+    const uniq = new Set();
+    const items = [];
+    for (const el of nodes) {
+      if (!isVisible(el)) continue;
+      const selector = cssPath(el);
+      if (!selector || uniq.has(selector)) continue;
+      uniq.add(selector);
+      const text = (el.innerText || el.value || '').trim();
+      items.push({
+        selector,
+        tag: el.tagName.toLowerCase(),
+        type: el.getAttribute('type') || '',
+        role: el.getAttribute('role') || '',
+        placeholder: el.getAttribute('placeholder') || '',
+        title: el.getAttribute('title') || '',
+        ariaLabel: el.getAttribute('aria-label') || '',
+        text,
+      });
+    }
+    lastInspect = items;
+    return items;
+  };
+
+  // Value-property writes (el.value = ..., el.fill) fire no mutation records,
+  // so tools that perform them must invalidate the cache explicitly.
+  const invalidate = () => { lastInspect = null; };
+
+  window.__mcp = { isVisible, cssPath, collect, invalidate };
+}
+"""
+
+# Tiny per-call payloads: invoke the installed helpers, or (re)install them on
+# a document where the init script didn't run.
+_COLLECT_JS = "() => (window.__mcp && window.__mcp.collect) ? window.__mcp.collect() : null"
+_INSTALL_HELPERS_JS = "() => { " + _MCP_HELPERS_BODY + " return true; }"
+_INVALIDATE_JS = "() => { if (window.__mcp && window.__mcp.invalidate) window.__mcp.invalidate(); return true; }"
+
+
+async def _invalidate_inspect_cache(page: Any) -> None:
+    """
+    Force the next collect() to re-walk the DOM. The MutationObserver can't
+    see value-property writes (fill, select, key input), so tools that make
+    them call this to keep inspect_page from serving a stale element list.
+    """
+    try:
+        await page.evaluate(_INVALIDATE_JS)
+    except Exception:
+        pass
+
+
+async def _install_page_helpers(page: Any) -> None:
+    """
+    Register the inspect helpers as an init script so they survive navigations.
+    Best-effort: pages without add_init_script get them lazily via evaluate.
+    """
+    try:
+        if hasattr(page, "add_init_script"):
+            await page.add_init_script(_MCP_HELPERS_BODY)
+    except Exception:
+        pass
+
+
+# Batched precheck + click in one CDP round-trip: resolve the element, bail on
+# file inputs (they open a native picker), click, and report the post-click URL.
+_CLICK_JS = r"""
+(sel) => {
+  const el = document.querySelector(sel);
+  if (!el) return {found: false};
+  const tag = el.tagName.toLowerCase();
+  const type = (el.getAttribute('type') || '').toLowerCase();
+  if (tag === 'input' && type === 'file') return {found: true, isFile: true};
+  el.click();
+  return {found: true, isFile: false, tag, type, url: location.href};
+}
+"""
+
+
 def _format_element_line(idx: int, meta: Dict[str, Any]) -> str:
-    # show a compact, helpful label
+    # show a compact, helpful label; inline conditionals instead of building
+    # and joining a list keeps allocations flat when formatting thousands of
+    # elements per inspect
     tag = meta.get("tag", "").lower()
     typ = meta.get("type", "")
     role = meta.get("role", "")
     placeholder = meta.get("placeholder") or ""
     title = meta.get("title") or ""
     aria = meta.get("ariaLabel") or ""
-    text = (meta.get("text") or "").strip()
-    text = " ".join(text.split())  # collapse whitespace
+    text = " ".join((meta.get("text") or "").split())  # collapse whitespace
     preview = text[:120] + ("…" if len(text) > 120 else "")
-    bits: List[str] = [f"{idx}: <{tag}{(' type='+typ) if typ else ''}>"]
-    if role:
-        bits.append(f"[role={role}]")
-    if placeholder:
-        bits.append(f'placeholder="{placeholder}"')
-    if aria:
-        bits.append(f'aria-label="{aria}"')
-    if title:
-        bits.append(f'title="{title}"')
-    if preview:
-        bits.append(f"text={json.dumps(preview)}")
-    return "  ".join(bits)
+    return (
+        f"{idx}: <{tag}{' type=' + typ if typ else ''}>"
+        + (f"  [role={role}]" if role else "")
+        + (f'  placeholder="{placeholder}"' if placeholder else "")
+        + (f'  aria-label="{aria}"' if aria else "")
+        + (f'  title="{title}"' if title else "")
+        + (f"  text={json.dumps(preview)}" if preview else "")
+    )
 
 
 # -----------------------------------------------------------------------------
@@ -128,8 +492,9 @@ async def initialize_browser(headless: bool = False, task: str = "") -> str:
     """
     Initialize a new browser instance (latest browser-use API).
     """
-    global browser, current_page, _selector_map, _last_inspected_url
+    global browser, current_page, _selector_map, _last_inspected_url, _session_headless
 
+    _session_headless = headless
     if browser is not None:
         # Cleanly stop previous session
         try:
@@ -139,70 +504,67 @@ async def initialize_browser(headless: bool = False, task: str = "") -> str:
         browser = None
         current_page = None
 
-    # Try different browser configurations for compatibility
-    browser_configs = [
-        # Configuration 1: Robust settings for MCP environment
-        {
-            "headless": headless,
-            "disable_security": True,
-            "chromium_sandbox": False,
-            "args": [
-                "--no-sandbox",
-                "--disable-dev-shm-usage",
-                "--disable-gpu",
-                "--disable-web-security",
-                "--disable-features=VizDisplayCompositor"
-            ]
-        },
-        # Configuration 2: Basic configuration as fallback
-        {
-            "headless": headless,
-            "args": ["--no-sandbox", "--disable-dev-shm-usage"]
-        },
-        # Configuration 3: Minimal configuration
-        {
-            "headless": headless
-        }
-    ]
-
     browser = None
     last_error = None
 
-    for i, browser_config in enumerate(browser_configs):
-        try:
-            logger.info(f"Trying browser configuration {i+1}/3")
-            browser = Browser(**browser_config)
-
-            # Start browser with timeout to avoid hanging
-            start_task = asyncio.create_task(browser.start())
-            await asyncio.wait_for(start_task, timeout=30.0)
-            logger.info(f"Browser started successfully with configuration {i+1}")
+    # Prefer a prewarmed instance over a cold launch; instances warmed with a
+    # different headless setting are discarded.
+    while not _pool.empty():
+        pooled_headless, pooled = _pool.get_nowait()
+        if pooled_headless == headless:
+            browser = pooled
+            logger.info("Using prewarmed browser instance")
             break
+        try:
+            await pooled.stop()
+        except Exception:
+            pass
 
-        except asyncio.TimeoutError as e:
-            last_error = f"Configuration {i+1} timed out after 30 seconds"
-            logger.warning(last_error)
-            if browser:
+    if browser is None:
+        # Race all configurations concurrently: the first to start wins, the
+        # rest are cancelled. A failing config no longer costs its full 30s
+        # timeout before the next one is attempted.
+        browser_configs = _browser_configs(headless)
+        logger.info(f"Trying {len(browser_configs)} browser configurations concurrently")
+        pending = {
+            asyncio.create_task(_try_start(cfg), name=f"browser-config-{i+1}")
+            for i, cfg in enumerate(browser_configs)
+        }
+        while pending and browser is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for finished in done:
                 try:
-                    await browser.stop()
-                except:
-                    pass
-                browser = None
-
-        except Exception as e:
-            last_error = f"Configuration {i+1} failed: {str(e)}"
-            logger.warning(last_error)
-            if browser:
+                    candidate = finished.result()
+                except Exception as e:
+                    last_error = f"{finished.get_name()} failed: {e}"
+                    logger.warning(last_error)
+                    continue
+                if browser is None:
+                    browser = candidate
+                    logger.info(f"Browser started successfully ({finished.get_name()})")
+                else:
+                    try:
+                        await candidate.stop()
+                    except Exception:
+                        pass
+        # Cancel losers and stop any that completed while we were deciding
+        for task in pending:
+            task.cancel()
+        for leftover in await asyncio.gather(*pending, return_exceptions=True):
+            if not isinstance(leftover, BaseException):
                 try:
-                    await browser.stop()
-                except:
+                    await leftover.stop()
+                except Exception:
                     pass
-                browser = None
 
     if browser is None:
         raise RuntimeError(f"Browser initialization failed with all configurations. Last error: {last_error}")
 
     current_page = await browser.new_page("about:blank")
+    # All pages of any previous session are gone; drop their cached URLs so a
+    # recycled id() can't serve a dead page's URL for a new page
+    _url_cache.clear()
+    await _install_page_helpers(current_page)
     _selector_map.clear()
     _last_inspected_url = None
 
@@ -232,6 +594,10 @@ async def close_browser() -> str:
             current_page = None
             _selector_map.clear()
             _last_inspected_url = None
+            _url_cache.clear()
+    # Restock the pool in the background so the next initialize is hot,
+    # matching the headless mode of the session just closed
+    _kick_prewarm(_session_headless if _session_headless is not None else True)
     return "Browser closed successfully"
 
 
@@ -241,7 +607,8 @@ async def search_google(query: str) -> str:
     page = await _require_page()
     url = f"https://www.google.com/search?q={url_quote(query)}&udm=14"
     await page.goto(url)
-    await asyncio.sleep(0.5)
+    await _wait_for_ready(page)
+    _url_cache.pop(id(page), None)
     _selector_map.clear()
     return f'🔍 Searched for "{query}" in Google'
 
@@ -251,7 +618,8 @@ async def go_to_url(url: str) -> str:
     """Navigate to URL in the current tab."""
     page = await _require_page()
     await page.goto(url)
-    await asyncio.sleep(0.5)
+    await _wait_for_ready(page)
+    _url_cache.pop(id(page), None)
     _selector_map.clear()
     return f"🔗 Navigated to {url}"
 
@@ -261,7 +629,8 @@ async def go_back() -> str:
     """Go back to the previous page."""
     page = await _require_page()
     await page.go_back()
-    await asyncio.sleep(0.3)
+    await _wait_for_ready(page)
+    _url_cache.pop(id(page), None)
     _selector_map.clear()
     return "🔙 Navigated back"
 
@@ -274,81 +643,25 @@ async def wait(seconds: int = 3) -> str:
 
 
 @mcp.tool()
-async def inspect_page() -> str:
+async def inspect_page(compact: bool = True) -> Any:
     """
     Lists interactive elements and extracts content from the current page.
     Creates a stable index→selector map for follow-up actions.
+    With compact=True (the default) returns the human-readable text block;
+    with compact=False returns the raw element records as structured data so
+    clients can pick the fields they need without re-parsing text.
     """
     global _selector_map, _last_inspected_url
 
     page = await _require_page()
-    # Collect interactive/meaningful elements (visible only) and compute a unique-ish CSS path
-    js = r"""
-    () => {
-      const isVisible = (el) => {
-        const rect = el.getBoundingClientRect();
-        const style = getComputedStyle(el);
-        return rect.width > 0 && rect.height > 0 &&
-               style.visibility !== 'hidden' && style.display !== 'none';
-      };
-
-      const cssPath = (el) => {
-        // generate a fairly unique CSS selector for the element
-        if (!(el instanceof Element)) return '';
-        const path = [];
-        while (el && el.nodeType === Node.ELEMENT_NODE && path.length < 8) {
-          let selector = el.nodeName.toLowerCase();
-          if (el.id) {
-            selector += '#' + CSS.escape(el.id);
-            path.unshift(selector);
-            break;
-          } else {
-            let sib = el, nth = 1;
-            while (sib = sib.previousElementSibling) {
-              if (sib.nodeName.toLowerCase() === selector) nth++;
-            }
-            selector += `:nth-of-type(${nth})`;
-          }
-          path.unshift(selector);
-          el = el.parentElement;
-        }
-        return path.join(' > ');
-      };
-
-      const nodes = Array.from(document.querySelectorAll(`
-        a[href],
-        button,
-        input:not([type="hidden"]):not([disabled]),
-        textarea:not([disabled]),
-        select:not([disabled]),
-        [role="button"],
-        [contenteditable=""], [contenteditable="true"],
-        [tabindex]:not([tabindex="-1"])
-      `));
-
-      const uniq = new Set();
-      const items = [];
-      for (const el of nodes) {
-        if (!isVisible(el)) continue;
-        const selector = cssPath(el);
-        if (!selector || uniq.has(selector)) continue;
-        uniq.add(selector);
-        const text = (el.innerText || el.value || '').trim();
-        items.push({
-          selector,
-          tag: el.tagName.toLowerCase(),
-          type: el.getAttribute('type') || '',
-          role: el.getAttribute('role') || '',
-          placeholder: el.getAttribute('placeholder') || '',
-          title: el.getAttribute('title') || '',
-          ariaLabel: el.getAttribute('aria-label') || '',
-          text,
-        });
-      }
-      return items;
-    }
-    """
-    result = await page.evaluate(js)  # type: ignore
+    # Let pending paints settle so we don't snapshot a half-rendered DOM
+    await _settle(page)
+    # Collect interactive/meaningful elements (visible only) via the persistent
+    # window.__mcp helpers; install them on the fly if this document lacks them.
+    result = await page.evaluate(_COLLECT_JS)  # type: ignore
+    if result is None:
+        await page.evaluate(_INSTALL_HELPERS_JS)  # type: ignore
+        result = await page.evaluate(_COLLECT_JS)  # type: ignore
     _selector_map.clear()
 
     # Handle case where result might be a string (error) or list
@@ -370,15 +683,27 @@ async def inspect_page() -> str:
         return "Error extracting elements from page."
 
     elements: List[Dict[str, Any]] = result
-    for i, item in enumerate(elements, start=1):
-        if isinstance(item, dict) and "selector" in item:
-            _selector_map[i] = item["selector"]
-    _last_inspected_url = await page.get_url()
-
     if not elements:
-        return "No interactive elements found on this page."
+        _last_inspected_url = await _page_url(page)
+        return [] if not compact else "No interactive elements found on this page."
+
+    # Single pass: build the selector map and (for compact mode) the text output.
+    # Structured mode skips the formatting loop entirely; FastMCP serializes
+    # the records once and the client projects whatever fields it wants.
     lines = ["Interactive elements:"]
-    lines += [_format_element_line(i, el) for i, el in enumerate(elements, start=1)]
+    for i, item in enumerate(elements, start=1):
+        if isinstance(item, dict) and "selector" in item:
+            _selector_map[i] = {
+                "selector": item["selector"],
+                "tag": (item.get("tag") or "").lower(),
+                "type": (item.get("type") or "").lower(),
+            }
+        if compact:
+            lines.append(_format_element_line(i, item))
+    _last_inspected_url = await _page_url(page)
+    if not compact:
+        return [dict(item, index=i) for i, item in enumerate(elements, start=1)
+                if isinstance(item, dict)]
     return "\n".join(lines)
 
 
@@ -391,43 +716,45 @@ async def click_element(index: int) -> str:
             f"Element with index {index} does not exist - call inspect_page() first and retry"
         )
 
-    selector = _selector_map[index]
+    meta = _selector_map[index]
+    selector = meta["selector"]
 
-    # Pre-check: file upload?
-    el_list = await page.get_elements_by_css_selector(selector)
-    if not el_list:
-        _selector_map.pop(index, None)
-        return f"Index {index}: element not found anymore (page changed). Re-run inspect_page()."
-    el = el_list[0]
-
-    el_type = (await el.get_attribute("type")) or ""
-    el_tag = (await el.get_attribute("tagName")) or ""
-    if el_tag.lower() == "input" and el_type.lower() == "file":
+    # Pre-check: file upload? tag/type are cached from inspect_page, so this
+    # usually costs zero CDP round-trips.
+    if meta.get("tag") == "input" and meta.get("type") == "file":
         return f"Index {index} opens a file picker. Use a dedicated upload tool."
 
-    # Detect new tab opening
-    before = await (await _require_browser()).get_pages()
-    before_ids = {id(p) for p in before}
+    # Snapshot the tab count for new-tab detection. Comparing id() sets of
+    # remote proxies is fragile (ids get recycled when proxies are collected);
+    # a length check against the ordered list is both cheaper and reliable.
+    b = await _require_browser()
+    before_count = len(await b.get_pages())
 
-    await el.click()
-    await asyncio.sleep(0.3)
+    # Fused existence check + file-input guard (covers cache misses) + click:
+    # a single CDP round-trip instead of handle lookup, attribute reads and click.
+    outcome = await page.evaluate(_CLICK_JS, selector)  # type: ignore
+    if not isinstance(outcome, dict) or not outcome.get("found"):
+        _selector_map.pop(index, None)
+        return f"Index {index}: element not found anymore (page changed). Re-run inspect_page()."
+    if outcome.get("isFile"):
+        return f"Index {index} opens a file picker. Use a dedicated upload tool."
+    await _wait_for_ready(page, timeout=5.0)
 
-    after = await (await _require_browser()).get_pages()
-    after_ids = {id(p) for p in after}
-    new_ids = after_ids - before_ids
+    # Both post-click reads are independent CDP round-trips; overlap them.
+    after, new_url = await asyncio.gather(b.get_pages(), page.get_url())
+    if new_url:
+        _url_cache[id(page)] = new_url
     msg = f"🖱️ Clicked element at index {index}"
-    if new_ids:
-        # Switch to newest page
-        for p in after:
-            if id(p) in new_ids:
-                global current_page
-                current_page = p
-                break
+    if len(after) > before_count:
+        # Switch to newest page (browser-use appends new pages at the end)
+        global current_page
+        current_page = after[-1]
+        _url_cache.pop(id(current_page), None)
         _selector_map.clear()
         msg += " - New tab opened and switched to it."
     else:
         # Maybe navigated in place; clear map if URL changed
-        _reset_index_if_navigated(await page.get_url())
+        _reset_index_if_navigated(new_url)
 
     return msg
 
@@ -443,14 +770,15 @@ async def input_text(index: int, text: str, has_sensitive_data: bool = False) ->
             f"Element index {index} does not exist - call inspect_page() first"
         )
 
-    selector = _selector_map[index]
+    selector = _selector_map[index]["selector"]
     el_list = await page.get_elements_by_css_selector(selector)
     if not el_list:
         _selector_map.pop(index, None)
         return f"Index {index}: element not found anymore. Re-run inspect_page()."
     el = el_list[0]
     await el.fill(text)
-    _reset_index_if_navigated(await page.get_url())
+    await _invalidate_inspect_cache(page)
+    _reset_index_if_navigated(await _page_url(page))
 
     return (
         f"⌨️ Input sensitive data into index {index}"
@@ -476,6 +804,7 @@ async def switch_tab(page_id: int) -> str:
 
     new_page = pages[page_id]
     new_url = await new_page.get_url()
+    _url_cache[id(new_page)] = new_url
     title = await new_page.get_title()
 
     # Only clear selector map if switching to a different URL than the one we inspected
@@ -496,7 +825,9 @@ async def open_tab(url: str) -> str:
     global current_page
     b = await _require_browser()
     current_page = await b.new_page(url)
-    await asyncio.sleep(0.3)
+    _url_cache.pop(id(current_page), None)
+    await _install_page_helpers(current_page)
+    await _wait_for_ready(current_page)
     _selector_map.clear()
     return f"🔗 Opened new tab with {url}"
 
@@ -532,6 +863,9 @@ async def send_keys(keys: str) -> str:
     """Send keyboard keys (e.g., 'Enter', 'Control+A')."""
     page = await _require_page()
     await page.press(keys)
+    await _invalidate_inspect_cache(page)
+    # Keys can navigate (e.g. Enter submitting a form); drop the cached URL
+    _url_cache.pop(id(page), None)
     return f"⌨️ Sent keys: {keys}"
 
 
@@ -583,7 +917,7 @@ async def get_dropdown_options(index: int) -> str:
     page = await _require_page()
     if index not in _selector_map:
         return "No such element index. Run inspect_page() first."
-    selector = _selector_map[index]
+    selector = _selector_map[index]["selector"]
     js = r"""
     (sel) => {
       const el = document.querySelector(sel);
@@ -611,26 +945,30 @@ async def select_dropdown_option(index: int, text: str) -> str:
     page = await _require_page()
     if index not in _selector_map:
         return "No such element index. Run inspect_page() first."
-    selector = _selector_map[index]
+    selector = _selector_map[index]["selector"]
 
-    # Resolve visible text -> value in-page, then call Element.select_option(values=value)
-    js_value_for_text = r"""
+    # Resolve visible text -> value AND select it in-page: one CDP round-trip
+    # instead of evaluate + element-handle lookup + select_option.
+    js_select_by_text = r"""
     (sel, want) => {
       const el = document.querySelector(sel);
-      if (!el || el.tagName.toLowerCase() !== 'select') return null;
+      if (!el || el.tagName.toLowerCase() !== 'select') return {ok: false, reason: 'notselect'};
       const match = Array.from(el.options).find(o => (o.text || '').trim() === want.trim());
-      return match ? match.value : null;
+      if (!match) return {ok: false, reason: 'notfound'};
+      el.value = match.value;
+      el.dispatchEvent(new Event('input', {bubbles: true}));
+      el.dispatchEvent(new Event('change', {bubbles: true}));
+      if (window.__mcp && window.__mcp.invalidate) window.__mcp.invalidate();
+      return {ok: true, value: match.value};
     }
     """
-    value = await page.evaluate(js_value_for_text, selector, text)  # type: ignore
-    if value is None:
+    outcome = await page.evaluate(js_select_by_text, selector, text)  # type: ignore
+    if not isinstance(outcome, dict) or not outcome.get("ok"):
+        reason = outcome.get("reason") if isinstance(outcome, dict) else None
+        if reason == "notselect":
+            return f"Element {index} is not a <select> (or disappeared); re-run inspect_page()."
         return f"Could not find option with visible text {json.dumps(text)}."
-
-    elements = await page.get_elements_by_css_selector(selector)
-    if not elements:
-        return f"Select element disappeared; re-run inspect_page()."
-    await elements[0].select_option(value)
-    return f"Selected option {json.dumps(text)} with value {json.dumps(value)}"
+    return f"Selected option {json.dumps(text)} with value {json.dumps(outcome['value'])}"
 
 
 @mcp.tool()
@@ -641,15 +979,29 @@ async def validate_page(expected_text: str = "") -> str:
     page = await _require_page()
     html = await page.evaluate("()=> document.documentElement.outerHTML")
     text_md = None
+    try:
+        import markdownify  # type: ignore
+    except Exception:  # optional dependency; fall back to raw HTML
+        markdownify = None  # type: ignore
     if markdownify:
         try:
-            text_md = markdownify.markdownify(html)  # type: ignore
+            # CPU-bound BeautifulSoup traversal; run it off the event loop so
+            # concurrent tool calls aren't blocked on large pages
+            text_md = await asyncio.to_thread(markdownify.markdownify, html)  # type: ignore
         except Exception:
             pass
 
-    content_preview = (text_md or html)[:800]
+    content = text_md or html
+    content_preview = content[:800]
     if expected_text:
-        found = (text_md or html).lower().find(expected_text.lower()) != -1
+        # A compiled IGNORECASE search avoids lowering the (potentially
+        # multi-megabyte) haystack into a full extra copy per call; only the
+        # needle's pattern is built, and it is cached across calls.
+        pattern = _re_cache.get(expected_text)
+        if pattern is None:
+            pattern = re.compile(re.escape(expected_text), re.IGNORECASE)
+            _re_cache[expected_text] = pattern
+        found = await asyncio.to_thread(lambda: pattern.search(content) is not None)
         if found:
             return f"✅ Validation successful: Expected text '{expected_text}' found on page."
         return f"⚠ Validation warning: Expected text '{expected_text}' not found.\nExtracted snippet: {content_preview}..."
@@ -666,6 +1018,10 @@ async def execute_javascript(script: str) -> str:
     page = await _require_page()
     try:
         result = await page.evaluate(script)
+        # Arbitrary scripts may have mutated element values or navigated
+        # (location.href = ...); drop both caches
+        await _invalidate_inspect_cache(page)
+        _url_cache.pop(id(page), None)
         if isinstance(result, (dict, list)):
             try:
                 return "📝 JavaScript executed successfully:\n" + json.dumps(result, indent=2)
@@ -692,7 +1048,9 @@ def main():
     global print
     print = _original_print
 
-    if not check_playwright_installation():
+    if os.environ.get("MCP_SKIP_PLAYWRIGHT_CHECK", "").lower() in ("1", "true", "yes"):
+        logger.info("Skipping Playwright installation check (MCP_SKIP_PLAYWRIGHT_CHECK)")
+    elif not check_playwright_installation():
         logger.error("Playwright is not properly installed. Exiting.")
         sys.exit(1)
 
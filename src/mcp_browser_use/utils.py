@@ -14,53 +14,95 @@ logging.getLogger("browser_use").setLevel(logging.CRITICAL)
 logging.getLogger("playwright").setLevel(logging.CRITICAL)
 
 
-def check_playwright_installation():
+def _find_chromium_binary():
+    """
+    Locate an installed Playwright Chromium binary on disk without launching it.
+    Returns:
+        str | None: path to the binary, or None if none was found
+    """
+    import glob
+
+    roots = []
+    env_root = os.environ.get("PLAYWRIGHT_BROWSERS_PATH")
+    if env_root:
+        roots.append(env_root)
+    home = os.path.expanduser("~")
+    roots += [
+        os.path.join(home, ".cache", "ms-playwright"),            # Linux
+        os.path.join(home, "Library", "Caches", "ms-playwright"), # macOS
+        os.path.join(home, "AppData", "Local", "ms-playwright"),  # Windows
+    ]
+    patterns = [
+        os.path.join("chromium-*", "chrome-linux", "chrome"),
+        os.path.join("chromium-*", "chrome-mac", "Chromium.app", "Contents", "MacOS", "Chromium"),
+        os.path.join("chromium-*", "chrome-win", "chrome.exe"),
+        os.path.join("chromium_headless_shell-*", "chrome-linux", "headless_shell"),
+    ]
+    for root in roots:
+        for pattern in patterns:
+            matches = glob.glob(os.path.join(root, pattern))
+            if matches:
+                return matches[0]
+    return None
+
+
+def _launch_probe():
+    """
+    Launch a headless Chromium to verify the installation actually works.
+    Slow (1-2s); only used when the filesystem check is inconclusive.
+    Returns:
+        bool: True if the launch succeeded, False otherwise
+    """
+    try:
+        from playwright.sync_api import sync_playwright
+
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=True)
+            browser.close()
+        return True
+    except Exception as e:
+        logger.error(f"Playwright launch probe failed: {e}")
+        return False
+
+
+def check_playwright_installation(full=False):
     """
     Check if playwright browsers are installed and install if needed.
+    Checks for the browser binary on disk first; the expensive launch probe
+    only runs when that is inconclusive (e.g. after a fresh install), or
+    always when full=True is passed for a thorough verification.
+    Args:
+        full: also launch a headless browser even if the binary exists on disk
     Returns:
         bool: True if browsers are available, False otherwise
     """
     try:
         # First check if browser-use is available
-        import browser_use
+        import browser_use  # noqa: F401
         logger.info("browser-use is available")
-
-        # Check if playwright browsers are installed
-        try:
-            from playwright.sync_api import sync_playwright
-
-            with sync_playwright() as p:
-                # Try to launch a browser to verify installation
-                browser = p.chromium.launch(headless=True)
-                browser.close()
-                logger.info("Playwright browsers are properly installed")
-            return True
-        except Exception as e:
-            if "Executable doesn't exist" in str(e) or "Browser executable" in str(e):
-                logger.warning("Playwright browsers are not installed. Installing now...")
-                try:
-                    # Install playwright browsers
-                    subprocess.run(
-                        [sys.executable, "-m", "playwright", "install", "chromium"],
-                        check=True,
-                        capture_output=True
-                    )
-                    logger.info("Playwright browsers installed successfully.")
-
-                    # Verify installation worked
-                    with sync_playwright() as p:
-                        browser = p.chromium.launch(headless=True)
-                        browser.close()
-                    return True
-                except subprocess.CalledProcessError as install_error:
-                    logger.error(f"Failed to install Playwright browsers: {install_error}")
-                    return False
-                except Exception as verify_error:
-                    logger.error(f"Browser installation verification failed: {verify_error}")
-                    return False
-            else:
-                logger.error(f"Error checking Playwright installation: {e}")
-                return False
     except ImportError as e:
         logger.error(f"browser-use or playwright is not installed: {e}")
         return False
+
+    if _find_chromium_binary():
+        logger.info("Playwright browsers are properly installed")
+        return _launch_probe() if full else True
+
+    logger.warning("Playwright browsers are not installed. Installing now...")
+    try:
+        # Install playwright browsers
+        subprocess.run(
+            [sys.executable, "-m", "playwright", "install", "chromium"],
+            check=True,
+            capture_output=True
+        )
+        logger.info("Playwright browsers installed successfully.")
+    except subprocess.CalledProcessError as install_error:
+        logger.error(f"Failed to install Playwright browsers: {install_error}")
+        return False
+
+    # Verify installation worked; fall back to a real launch if the binary
+    # still isn't where we expect it
+    if _find_chromium_binary():
+        return True
+    return _launch_probe()